@@ -18,6 +18,10 @@ from langchain_core.runnables import RunnablePassthrough
 
 from history import add_chat  # Add this import at the top
 from output_behavioural import get_persona_prompt  # Import the persona prompt function
+from dedup import strip_repeated_lines, dedup_chunks  # Boilerplate and duplicate chunk removal
+from llm_scheduler import get_scheduler, request_key, estimate_tokens  # Shared Gemini rate limiting
+from retrieval_server import RetrievalClient  # Optional shared embedding/search service
+from chunk_tuner import load_chunking_config  # Tuned chunk size/overlap/separators
 
 # ---------------- Setup asyncio for Streamlit ----------------
 try:
@@ -90,26 +94,62 @@ def validate_api_key(api_key):
 # ---------------- PDF Functions ----------------
 def get_pdf_text(pdf_docs):
     text = ""
+    removed_lines = 0
     for pdf in pdf_docs:
         pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            if page.extract_text():
-                text += page.extract_text()
+        pages = [page.extract_text() or "" for page in pdf_reader.pages]
+        # Drop headers/footers repeated on every page before chunking
+        pages, removed = strip_repeated_lines(pages)
+        removed_lines += removed
+        text += "\n".join(page for page in pages if page) + "\n"
+    st.session_state.dedup_report = {"boilerplate_lines": removed_lines}
     return text
 
 def get_text_chunks(text):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
+    # Settings from chunk_tuner.py output if present, otherwise 2000/200
+    settings = load_chunking_config(config.CHUNKING_CONFIG_PATH, config.CHUNKING_CORPUS)
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings["chunk_size"],
+        chunk_overlap=settings["chunk_overlap"],
+        separators=settings["separators"]
+    )
     return splitter.split_text(text)
 
+def load_embeddings():
+    """Create the embedder selected by EMBEDDING_BACKEND in config.py"""
+    if config.EMBEDDING_BACKEND == "onnx":
+        from onnx_embeddings import OnnxMiniLMEmbeddings
+        return OnnxMiniLMEmbeddings(config.ONNX_MODEL_DIR, intra_op_threads=config.EMBEDDING_THREADS)
+    return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+
 def get_vector_store(chunks):
+    # Embed one canonical copy of repeated chunks, metadata points back to the copies
+    chunks, metadatas, report = dedup_chunks(chunks)
+    st.session_state.setdefault("dedup_report", {}).update(report)
+
+    # With a retrieval service, embedding and search happen there (one model and
+    # index cache shared by all app processes) and this session only keeps a handle
+    if config.RETRIEVAL_SERVICE_URL:
+        return RetrievalClient(config.RETRIEVAL_SERVICE_URL).build_index(chunks, metadatas)
+
     # Use cached embeddings if available
     if 'embeddings' not in st.session_state:
-        st.session_state.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        st.session_state.embeddings = load_embeddings()
     embeddings = st.session_state.embeddings
-    vector_store = FAISS.from_texts(chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+    vector_store = FAISS.from_texts(chunks, embedding=embeddings, metadatas=metadatas)
     return vector_store
 
+def format_dedup_report(report):
+    removed = report.get("exact_duplicates", 0) + report.get("near_duplicates", 0)
+    return (
+        f"🧹 Removed {removed} duplicate chunks of {report.get('chunks_in', 0)} "
+        f"({report.get('exact_duplicates', 0)} exact, {report.get('near_duplicates', 0)} near) "
+        f"and {report.get('boilerplate_lines', 0)} repeated header/footer lines"
+    )
+
+# Gemini model used for answers
+GEMINI_MODEL = "gemini-2.5-flash"
+
 def get_conversational_chain(api_key):
     # Get current persona from session state (default if not set)
     current_persona = st.session_state.get('persona', 'default')
@@ -117,7 +157,7 @@ def get_conversational_chain(api_key):
     # Get the appropriate prompt template for the current persona
     prompt_template = get_persona_prompt(current_persona)
 
-    model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3, google_api_key=api_key)
+    model = ChatGoogleGenerativeAI(model=GEMINI_MODEL, temperature=0.3, google_api_key=api_key)
     prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
     
     # Create chain using LCEL (Langchain Expression Language)
@@ -176,12 +216,8 @@ def user_input(user_question, pdf_docs, conversation_history, api_key, username)
             text_chunks = st.session_state.text_chunks
             vector_store = st.session_state.vector_store
 
-        # Load vector DB from cache
-        embeddings = st.session_state.embeddings
-        new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-
-        # Similarity search
-        docs = new_db.similarity_search(user_question)
+        # Similarity search on this session's index (local FAISS or the retrieval service)
+        docs = vector_store.similarity_search(user_question)
 
         # Gemini LLM
         chain = get_conversational_chain(api_key)
@@ -189,11 +225,26 @@ def user_input(user_question, pdf_docs, conversation_history, api_key, username)
         # Format context from documents
         context = "\n\n".join([doc.page_content for doc in docs])
         
-        # Run the chain with context and question
-        response_output = chain.invoke({
-            "context": context,
-            "question": user_question
-        })
+        # Run the chain through the shared scheduler: rate limited per API key, fair across
+        # users, and identical in-flight questions on the same context share one call
+        scheduler = get_scheduler(config.LLM_REQUESTS_PER_MINUTE, config.LLM_TOKENS_PER_MINUTE, config.LLM_MAX_CONCURRENT)
+        persona = st.session_state.get('persona', 'default')
+        queue_status = st.empty()
+
+        def show_queue_position(position):
+            if position > 0:
+                queue_status.info(f"⏳ Busy right now - you are #{position} in the queue...")
+            else:
+                queue_status.info("🤖 Generating answer...")
+
+        response_output = scheduler.run(
+            api_key, username,
+            key=request_key(api_key, GEMINI_MODEL, persona, context, user_question),
+            tokens=estimate_tokens(get_persona_prompt(persona) + context + user_question),
+            call=lambda: chain.invoke({"context": context, "question": user_question}),
+            on_wait=show_queue_position
+        )
+        queue_status.empty()
         user_question_output = user_question
         pdf_names = [pdf.name for pdf in pdf_docs] if pdf_docs else []
 
@@ -313,6 +364,7 @@ def run_chatbot(username):
                     chunks = get_text_chunks(get_pdf_text(pdf_docs))
                     get_vector_store(chunks)
                     st.sidebar.success("✅ PDFs processed successfully!")
+                    st.sidebar.info(format_dedup_report(st.session_state.dedup_report))
                 except Exception as e:
                     st.sidebar.error(f"❌ Error processing PDFs: {str(e)}")
         else:
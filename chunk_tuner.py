@@ -0,0 +1,206 @@
+"""
+Chunking parameter tuner.
+
+Sweeps chunk size, overlap and splitter separators over a labeled question/answer fixture
+set and measures, for every setting:
+- retrieval hit rate: share of questions whose expected answer text is in the top-k chunks
+- ingest time: splitting + deduplication + embedding + FAISS build
+- index bytes: serialized FAISS index size
+- average context tokens: size of the k retrieved chunks sent to Gemini per question
+
+It then writes a recommended config per corpus (best hit rate, then cheapest context)
+that app.get_text_chunks loads from CHUNKING_CONFIG_PATH.
+
+Fixture file (JSON):
+    {
+      "contracts": {
+        "pdfs": ["fixtures/contract1.pdf", "fixtures/contract2.pdf"],
+        "questions": [
+          {"question": "What is the notice period?", "answer": "ninety (90) days"}
+        ]
+      },
+      "papers": {"texts": ["...raw text..."], "questions": [...]}
+    }
+
+Run:
+    python chunk_tuner.py fixtures.json --out chunking_config.json
+    python chunk_tuner.py fixtures.json --sizes 800 1500 2000 --overlaps 0 0.1 --separators default sentence
+"""
+import argparse
+import json
+import os
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from dedup import dedup_chunks, strip_repeated_lines
+
+# Named separator sets for RecursiveCharacterTextSplitter (tried in order)
+SEPARATOR_SETS = {
+    "default": ["\n\n", "\n", " ", ""],
+    "paragraph": ["\n\n", ". ", "\n", " ", ""],
+    "sentence": [". ", "? ", "! ", "\n", " ", ""],
+}
+
+# Used when no tuned config exists (the original hard-coded values)
+DEFAULT_CHUNKING = {"chunk_size": 2000, "chunk_overlap": 200, "separators": SEPARATOR_SETS["default"]}
+
+
+def load_chunking_config(path, corpus="default"):
+    """Chunking settings for `corpus` from a tuner output file, or the defaults"""
+    if not path or not os.path.exists(path):
+        return DEFAULT_CHUNKING
+    with open(path) as f:
+        tuned = json.load(f)
+    corpora = tuned.get("corpora", {})
+    return corpora.get(corpus) or tuned.get("default") or DEFAULT_CHUNKING
+
+
+# ---------------- Fixtures ----------------
+def load_corpus_text(corpus, base_dir):
+    """Extract text like app.get_pdf_text (repeated headers/footers removed)"""
+    from PyPDF2 import PdfReader
+
+    text = ""
+    for path in corpus.get("pdfs", []):
+        pages = [page.extract_text() or "" for page in PdfReader(os.path.join(base_dir, path)).pages]
+        pages, _ = strip_repeated_lines(pages)
+        text += "\n".join(page for page in pages if page) + "\n"
+    for raw in corpus.get("texts", []):
+        text += raw + "\n"
+    return text
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def estimate_context_tokens(text):
+    # Same ~4 characters per token rule as llm_scheduler.estimate_tokens
+    return len(text) // 4
+
+
+# ---------------- Sweep ----------------
+def evaluate(text, questions, embeddings, chunk_size, chunk_overlap, separators, k=4):
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    start = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=SEPARATOR_SETS[separators]
+    )
+    chunks, metadatas, _ = dedup_chunks(splitter.split_text(text))
+    store = FAISS.from_texts(chunks, embedding=embeddings, metadatas=metadatas)
+    ingest_s = time.perf_counter() - start
+
+    hits = 0
+    context_tokens = 0
+    for item in questions:
+        docs = store.similarity_search(item["question"], k=k)
+        context = "\n\n".join(doc.page_content for doc in docs)
+        context_tokens += estimate_context_tokens(context)
+        if normalize(item["answer"]) in normalize(context):
+            hits += 1
+
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "separators": separators,
+        "chunks": len(chunks),
+        "hit_rate": hits / len(questions),
+        "ingest_s": ingest_s,
+        "index_bytes": len(faiss.serialize_index(store.index)),
+        "avg_context_tokens": context_tokens / len(questions),
+    }
+
+
+def sweep(text, questions, embeddings, sizes, overlaps, separator_sets, k=4):
+    results = []
+    for size in sizes:
+        for overlap in overlaps:
+            # Overlaps below 1 are a share of the chunk size
+            chunk_overlap = int(size * overlap) if overlap < 1 else int(overlap)
+            if chunk_overlap >= size:
+                continue
+            for separators in separator_sets:
+                results.append(evaluate(text, questions, embeddings, size, chunk_overlap, separators, k))
+    return results
+
+
+def recommend(results, tolerance=0.02):
+    """Cheapest setting whose hit rate is within `tolerance` of the best one"""
+    best_hit_rate = max(r["hit_rate"] for r in results)
+    candidates = [r for r in results if r["hit_rate"] >= best_hit_rate - tolerance]
+    return min(candidates, key=lambda r: (r["avg_context_tokens"], r["index_bytes"], r["ingest_s"]))
+
+
+def print_report(name, results, chosen):
+    print(f"\n📚 Corpus: {name}")
+    print(f"{'size':>6} {'overlap':>7} {'separators':>10} {'chunks':>6} {'hit rate':>8} "
+          f"{'ingest s':>8} {'index KB':>8} {'ctx tokens':>10}")
+    for r in sorted(results, key=lambda r: (-r["hit_rate"], r["avg_context_tokens"])):
+        mark = "  ⭐" if r is chosen else ""
+        print(f"{r['chunk_size']:>6} {r['chunk_overlap']:>7} {r['separators']:>10} {r['chunks']:>6} "
+              f"{r['hit_rate']:>8.2f} {r['ingest_s']:>8.2f} {r['index_bytes'] / 1024:>8.0f} "
+              f"{r['avg_context_tokens']:>10.0f}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune get_text_chunks settings on a labeled fixture set")
+    parser.add_argument("fixtures", help="JSON file with corpora, documents and expected answers")
+    parser.add_argument("--out", default="chunking_config.json", help="Where to write the recommended config")
+    parser.add_argument("--report", help="Also write every measurement to this JSON file")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 1500, 2000, 3000])
+    parser.add_argument("--overlaps", type=float, nargs="+", default=[0, 0.1, 0.2],
+                        help="Overlap per chunk, as a share of the size (<1) or in characters (>=1)")
+    parser.add_argument("--separators", nargs="+", choices=list(SEPARATOR_SETS), default=list(SEPARATOR_SETS))
+    parser.add_argument("--k", type=int, default=4, help="Chunks retrieved per question (app uses 4)")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Hit rate a cheaper setting may give up versus the best one")
+    parser.add_argument("--backend", choices=["pytorch", "onnx"], default="pytorch")
+    parser.add_argument("--onnx-model-dir", default="models/all-MiniLM-L6-v2-onnx")
+    args = parser.parse_args()
+
+    if args.backend == "onnx":
+        from onnx_embeddings import OnnxMiniLMEmbeddings
+        embeddings = OnnxMiniLMEmbeddings(args.onnx_model_dir)
+    else:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(args.fixtures))
+
+    tuned = {"corpora": {}}
+    measurements = {}
+    for name, corpus in fixtures.items():
+        text = load_corpus_text(corpus, base_dir)
+        if not text.strip() or not corpus.get("questions"):
+            print(f"⚠️ Skipping {name}: no text or no questions")
+            continue
+        results = sweep(text, corpus["questions"], embeddings, args.sizes, args.overlaps, args.separators, args.k)
+        chosen = recommend(results, args.tolerance)
+        print_report(name, results, chosen)
+        measurements[name] = results
+        tuned["corpora"][name] = {
+            "chunk_size": chosen["chunk_size"],
+            "chunk_overlap": chosen["chunk_overlap"],
+            "separators": SEPARATOR_SETS[chosen["separators"]],
+        }
+
+    if not tuned["corpora"]:
+        raise SystemExit("No corpus could be evaluated")
+    # A single corpus also becomes the default for the app
+    if len(tuned["corpora"]) == 1:
+        tuned["default"] = next(iter(tuned["corpora"].values()))
+    with open(args.out, "w") as f:
+        json.dump(tuned, f, indent=2)
+    print(f"\n✅ Recommended config written to {args.out}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(measurements, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
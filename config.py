@@ -1,8 +1,8 @@
 import streamlit as st
 
 GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
+SUPABASE_URL = st.secrets.get("SUPABASE_URL", "")
+SUPABASE_KEY = st.secrets.get("SUPABASE_KEY", "")
 
 # how to add supabase details here
 # first go to https://supabase.com/ and create a free account
@@ -18,3 +18,50 @@ SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
 # then create credentials and get the API key
 # GOOGLE_API_KEY = "your_google_api_key"
 
+
+# how to choose where chat history is stored
+# "supabase" keeps history in the cloud (needs SUPABASE_URL and SUPABASE_KEY above)
+# "sqlite" keeps history in a local file, works offline and needs no account
+# HISTORY_BACKEND = "sqlite"
+# SQLITE_DB_PATH = "chat_history.db"
+HISTORY_BACKEND = st.secrets.get("HISTORY_BACKEND", "supabase")
+SQLITE_DB_PATH = st.secrets.get("SQLITE_DB_PATH", "chat_history.db")
+
+
+# Gemini quota shared by all users of this app instance (per API key)
+# match these to your plan at https://ai.google.dev/gemini-api/docs/rate-limits
+# LLM_REQUESTS_PER_MINUTE = 10
+# LLM_TOKENS_PER_MINUTE = 250000
+# LLM_MAX_CONCURRENT = 4
+LLM_REQUESTS_PER_MINUTE = st.secrets.get("LLM_REQUESTS_PER_MINUTE", 10)
+LLM_TOKENS_PER_MINUTE = st.secrets.get("LLM_TOKENS_PER_MINUTE", 250000)
+LLM_MAX_CONCURRENT = st.secrets.get("LLM_MAX_CONCURRENT", 4)
+
+
+# how to choose the embedding backend
+# "pytorch" runs all-MiniLM-L6-v2 through HuggingFaceEmbeddings (downloads the model on first use)
+# "onnx" runs an int8-quantized copy with ONNX Runtime from local files, faster on CPU
+#   create the files once with: python onnx_embeddings.py export --out models/all-MiniLM-L6-v2-onnx
+# EMBEDDING_BACKEND = "onnx"
+# ONNX_MODEL_DIR = "models/all-MiniLM-L6-v2-onnx"
+# EMBEDDING_THREADS = 0   (0 = one per CPU core)
+EMBEDDING_BACKEND = st.secrets.get("EMBEDDING_BACKEND", "pytorch")
+ONNX_MODEL_DIR = st.secrets.get("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+EMBEDDING_THREADS = st.secrets.get("EMBEDDING_THREADS", 0)
+
+
+# how to share one embedding model and index cache between several app processes
+# start the service with: python retrieval_server.py --port 8765
+# then point every app process at it (leave empty to embed and search inside the app)
+# RETRIEVAL_SERVICE_URL = "http://127.0.0.1:8765"
+RETRIEVAL_SERVICE_URL = st.secrets.get("RETRIEVAL_SERVICE_URL", "")
+
+
+# how to use tuned chunking settings
+# run: python chunk_tuner.py fixtures.json --out chunking_config.json
+# CHUNKING_CORPUS picks which corpus section of that file to use (e.g. "contracts")
+# without the file the app uses chunk_size=2000, chunk_overlap=200
+# CHUNKING_CONFIG_PATH = "chunking_config.json"
+# CHUNKING_CORPUS = "default"
+CHUNKING_CONFIG_PATH = st.secrets.get("CHUNKING_CONFIG_PATH", "chunking_config.json")
+CHUNKING_CORPUS = st.secrets.get("CHUNKING_CORPUS", "default")
@@ -0,0 +1,143 @@
+import hashlib
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+# ---------------- Settings ----------------
+# A line counts as header/footer when it repeats at the top/bottom of this share of pages
+BOILERPLATE_PAGE_FRACTION = 0.5
+# ...and of at least this many pages (short PDFs are left alone)
+BOILERPLATE_MIN_PAGES = 3
+# How many lines at the top and bottom of each page are header/footer candidates
+BOILERPLATE_EDGE_LINES = 3
+# Lines up to this many words match ignoring numbers ("Page 3 of 10"), longer ones must match exactly
+BOILERPLATE_NUMBERED_WORDS = 4
+
+# Chunks whose estimated Jaccard similarity reaches this are near-duplicates
+NEAR_DUP_THRESHOLD = 0.85
+# Word shingle size used for MinHash
+SHINGLE_SIZE = 3
+# MinHash signature length = LSH_BANDS * LSH_ROWS
+LSH_BANDS = 32
+LSH_ROWS = 4
+
+# Largest 32-bit prime, keeps (a * x + b) inside uint64
+_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, 4294967291, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 4294967291, size=LSH_BANDS * LSH_ROWS, dtype=np.uint64)
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+# ---------------- Header / Footer removal ----------------
+def _line_key(line):
+    line = _normalize(line)
+    # Ignore page numbers and dates so "Page 3 of 10" matches "Page 4 of 10",
+    # but only in short lines: body text that differs only in numbers must stay
+    if len(line.split()) <= BOILERPLATE_NUMBERED_WORDS:
+        return re.sub(r"\d+", "#", line)
+    return line
+
+
+def strip_repeated_lines(pages):
+    """
+    Remove header/footer lines that repeat across the pages of one PDF.
+    Returns (cleaned pages, number of lines removed)
+    """
+    page_lines = [page.splitlines() for page in pages]
+    min_pages = max(BOILERPLATE_MIN_PAGES, int(len(pages) * BOILERPLATE_PAGE_FRACTION))
+    if len(pages) < min_pages:
+        return pages, 0
+
+    # Count each candidate line once per page
+    counts = Counter()
+    for lines in page_lines:
+        edges = lines[:BOILERPLATE_EDGE_LINES] + lines[-BOILERPLATE_EDGE_LINES:]
+        counts.update({_line_key(line) for line in edges if line.strip()})
+    boilerplate = {key for key, count in counts.items() if count >= min_pages}
+    if not boilerplate:
+        return pages, 0
+
+    cleaned = []
+    removed = 0
+    for lines in page_lines:
+        edge = BOILERPLATE_EDGE_LINES
+        kept = []
+        for i, line in enumerate(lines):
+            at_edge = i < edge or i >= len(lines) - edge
+            if at_edge and _line_key(line) in boilerplate:
+                removed += 1
+            else:
+                kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned, removed
+
+
+# ---------------- Chunk deduplication ----------------
+def _minhash(text):
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # One row per permutation, keep the minimum hash of each
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+def dedup_chunks(chunks):
+    """
+    Drop exact and near-duplicate chunks, keeping the first copy as canonical.
+    Returns (canonical chunks, metadata per chunk, report)
+    Each metadata has the chunk's original position and the positions of its removed duplicates.
+    """
+    canonical = []
+    metadatas = []
+    signatures = []
+    exact_seen = {}
+    buckets = {}
+    exact_removed = 0
+    near_removed = 0
+
+    for position, chunk in enumerate(chunks):
+        text = _normalize(chunk)
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        if digest in exact_seen:
+            metadatas[exact_seen[digest]]["duplicates"].append(position)
+            exact_removed += 1
+            continue
+
+        signature = _minhash(text)
+        bands = [(b, signature[b * LSH_ROWS:(b + 1) * LSH_ROWS].tobytes()) for b in range(LSH_BANDS)]
+        candidates = {idx for band in bands for idx in buckets.get(band, ())}
+        match = None
+        for idx in sorted(candidates):
+            if np.mean(signatures[idx] == signature) >= NEAR_DUP_THRESHOLD:
+                match = idx
+                break
+        if match is not None:
+            metadatas[match]["duplicates"].append(position)
+            near_removed += 1
+            continue
+
+        idx = len(canonical)
+        exact_seen[digest] = idx
+        canonical.append(chunk)
+        metadatas.append({"chunk": position, "duplicates": []})
+        signatures.append(signature)
+        for band in bands:
+            buckets.setdefault(band, []).append(idx)
+
+    report = {
+        "chunks_in": len(chunks),
+        "chunks_kept": len(canonical),
+        "exact_duplicates": exact_removed,
+        "near_duplicates": near_removed,
+        "chars_removed": sum(len(c) for c in chunks) - sum(len(c) for c in canonical)
+    }
+    return canonical, metadatas, report
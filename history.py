@@ -1,22 +1,25 @@
 import os
+import time
 from datetime import datetime
 import streamlit as st
 import base64
-from supabase import create_client, Client
 
-# Supabase credentials
-from config import SUPABASE_URL, SUPABASE_KEY
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Table name in Supabase
-TABLE_NAME = "chat_history"
+# History backend (Supabase or local SQLite) selected in config.py
+from config import HISTORY_BACKEND, SUPABASE_URL, SUPABASE_KEY, SQLITE_DB_PATH
+from history_store import create_history_store
+store = create_history_store(
+    HISTORY_BACKEND,
+    supabase_url=SUPABASE_URL,
+    supabase_key=SUPABASE_KEY,
+    sqlite_path=SQLITE_DB_PATH
+)
 
 # -----------------------------
-# Supabase History storage functions
+# History storage functions
 # -----------------------------
 
 def add_chat(question, answer, model, timestamp, pdfs, username):
-    """Add a single chat entry for today's date to Supabase"""
+    """Add a single chat entry for today's date to the history store"""
     today = datetime.now().strftime('%Y-%m-%d')
     data = {
         "username": username,
@@ -28,17 +31,16 @@ def add_chat(question, answer, model, timestamp, pdfs, username):
         "date": today
     }
     try:
-        supabase.table(TABLE_NAME).insert(data).execute()
+        store.insert(data)
     except Exception as e:
         # Log error but don't crash the app
-        print(f"⚠️ Warning: Could not save to Supabase: {str(e)}")
+        print(f"⚠️ Warning: Could not save to {HISTORY_BACKEND}: {str(e)}")
         # Silently continue - the chat still works, just not saved to database
 
 def get_all_history(username):
-    """Fetch all chat history for a user from Supabase, grouped by date"""
+    """Fetch all chat history for a user from the history store, grouped by date"""
     try:
-        response = supabase.table(TABLE_NAME).select("*").eq("username", username).execute()
-        items = response.data if response.data else []
+        items = store.fetch(username)
         history = {}
         for item in items:
             date = item.get("date")
@@ -55,25 +57,82 @@ def get_all_history(username):
         return history
     except Exception as e:
         # Return empty history if connection fails
-        print(f"⚠️ Warning: Could not fetch history from Supabase: {str(e)}")
+        print(f"⚠️ Warning: Could not fetch history from {HISTORY_BACKEND}: {str(e)}")
         return {}
 
-def clear_history(username):
-    """Delete all chat history for a user from Supabase"""
+def clear_history(username, date=None):
+    """Delete chat history for a user (optionally only one date) from the history store"""
     try:
-        supabase.table(TABLE_NAME).delete().eq("username", username).execute()
+        store.delete(username, date)
     except Exception as e:
-        print(f"⚠️ Warning: Could not clear history from Supabase: {str(e)}")
+        print(f"⚠️ Warning: Could not clear history from {HISTORY_BACKEND}: {str(e)}")
+
+def search_history(username, query, page=0, page_size=20):
+    """Ranked full-text search over a user's questions, answers and PDF names.
+    Returns (chats for the requested page, total number of matches)"""
+    try:
+        return store.search(username, query, limit=page_size, offset=page * page_size)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not search history in {HISTORY_BACKEND}: {str(e)}")
+        return [], 0
 
 
 # -----------------------------
 # Streamlit UI
 # -----------------------------
 
+# Number of search results shown per page
+SEARCH_PAGE_SIZE = 20
+
+def show_search_results(username, query):
+    # Reset to the first page whenever the search text changes
+    if st.session_state.get("search_query") != query:
+        st.session_state["search_query"] = query
+        st.session_state["search_page"] = 0
+    page = st.session_state.get("search_page", 0)
+
+    start = time.perf_counter()
+    chats, total = search_history(username, query, page, SEARCH_PAGE_SIZE)
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    # Matches were deleted (or the page is stale): show the last page that has results
+    if not chats and total > 0:
+        page = pages - 1
+        st.session_state["search_page"] = page
+        chats, total = search_history(username, query, page, SEARCH_PAGE_SIZE)
+        pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if total == 0:
+        st.info("No chats match your search.")
+        return
+
+    st.caption(f"{total} matching chats ({elapsed_ms:.0f} ms) | Page {page + 1} of {pages}")
+    for chat in chats:
+        st.markdown(f"**Q:** {chat['question']}")
+        st.markdown(f"**A:** {chat['answer']}")
+        st.caption(f"Date: {chat['date']} | Model: {chat['model']} | Time: {chat['timestamp']} | PDFs: {chat['pdfs']}")
+        st.markdown("---")
+
+    col1, _, col3 = st.columns([1, 4, 1])
+    with col1:
+        if st.button("⬅️ Previous", key="search_prev", disabled=page == 0, use_container_width=True):
+            st.session_state["search_page"] = page - 1
+            st.rerun()
+    with col3:
+        if st.button("Next ➡️", key="search_next", disabled=page + 1 >= pages, use_container_width=True):
+            st.session_state["search_page"] = page + 1
+            st.rerun()
+
 def show_history_ui(username):
     st.markdown("""
         <h2 style='font-size:2.3rem; font-weight:700; margin-bottom:0.5rem;'>Chat Record 💬📝</h2>
     """, unsafe_allow_html=True)
+
+    # Search box: when filled, show ranked matches across all dates instead of one date
+    query = st.text_input("🔎 Search your chats:", key="history_search", placeholder="Search questions, answers or PDF names")
+    if query.strip():
+        show_search_results(username, query.strip())
+        return
+
     history = get_all_history(username)
     if not history:
         st.info("No chat history found.")
@@ -180,10 +239,9 @@ def show_history_ui(username):
             )
 
         if delete_clicked:
-            supabase.table(TABLE_NAME).delete().eq("username", username).eq("date", selected_date).execute()
+            clear_history(username, selected_date)
             st.sidebar.success(f"Chats for {selected_date} deleted successfully!")
             st.session_state["selected_date"] = None
             # Add a delay of 2 seconds before rerunning
-            import time
             time.sleep(2)
             st.rerun()
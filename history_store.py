@@ -0,0 +1,192 @@
+import re
+import sqlite3
+import threading
+
+# Table name used by every backend
+TABLE_NAME = "chat_history"
+
+# Columns stored for each chat entry (in insert order)
+COLUMNS = ("username", "question", "answer", "model", "timestamp", "pdfs", "date")
+
+# Columns covered by full-text search
+SEARCH_COLUMNS = ("question", "answer", "pdfs")
+
+
+def search_terms(query):
+    """Split a free-text search box value into plain word terms"""
+    return re.findall(r"\w+", query.lower())
+
+
+# -----------------------------
+# Supabase backend
+# -----------------------------
+
+class SupabaseHistoryStore:
+    """Chat history stored in a Supabase (Postgres) table"""
+
+    def __init__(self, url, key):
+        # Imported here so the sqlite backend works without the supabase package
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def insert(self, row):
+        self.client.table(TABLE_NAME).insert(row).execute()
+
+    def fetch(self, username):
+        response = self.client.table(TABLE_NAME).select("*").eq("username", username).execute()
+        return response.data if response.data else []
+
+    def delete(self, username, date=None):
+        query = self.client.table(TABLE_NAME).delete().eq("username", username)
+        if date is not None:
+            query = query.eq("date", date)
+        query.execute()
+
+    def search(self, username, query, limit, offset=0):
+        """Ranked search through the search_chat_history function (see supabase_search.sql)"""
+        terms = search_terms(query)
+        if not terms:
+            return [], 0
+        params = {"p_username": username, "p_query": " & ".join(f"{term}:*" for term in terms)}
+        total = self.client.rpc("search_chat_history_count", params).execute().data or 0
+        response = self.client.rpc("search_chat_history", {**params, "p_limit": limit, "p_offset": offset}).execute()
+        rows = response.data if response.data else []
+        return rows, total
+
+
+# -----------------------------
+# Local SQLite backend
+# -----------------------------
+
+class SQLiteHistoryStore:
+    """
+    Chat history stored in a local SQLite file.
+    Uses WAL mode so readers never block the writer (or each other), and one
+    connection per thread because Streamlit runs every session in its own thread.
+    """
+
+    SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            question TEXT,
+            answer TEXT,
+            model TEXT,
+            timestamp TEXT,
+            pdfs TEXT,
+            date TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_username_date
+            ON {TABLE_NAME} (username, date);
+    """
+
+    # FTS5 index over question/answer/pdfs, kept in sync with the table by triggers
+    FTS_TABLE = f"{TABLE_NAME}_fts"
+    FTS_SCHEMA = f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            {', '.join(SEARCH_COLUMNS)},
+            content='{TABLE_NAME}', content_rowid='id', tokenize='unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE_NAME} BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES (new.id, {', '.join('new.' + col for col in SEARCH_COLUMNS)});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE_NAME} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {', '.join('old.' + col for col in SEARCH_COLUMNS)});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {TABLE_NAME} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {', '.join('old.' + col for col in SEARCH_COLUMNS)});
+            INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)})
+            VALUES (new.id, {', '.join('new.' + col for col in SEARCH_COLUMNS)});
+        END;
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild');
+    """
+
+    # Fixed SQL text so sqlite3 reuses the prepared statement from its cache
+    INSERT_SQL = (
+        f"INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in COLUMNS)})"
+    )
+    SELECT_SQL = (
+        f"SELECT {', '.join(COLUMNS)} FROM {TABLE_NAME} "
+        f"WHERE username = ? ORDER BY date, id"
+    )
+    DELETE_SQL = f"DELETE FROM {TABLE_NAME} WHERE username = ?"
+    DELETE_DATE_SQL = f"DELETE FROM {TABLE_NAME} WHERE username = ? AND date = ?"
+    # CROSS JOIN pins the join order: walk FTS matches first, then look rows up by id
+    # (otherwise SQLite may scan every row of the user and run MATCH per row)
+    SEARCH_SQL = (
+        f"SELECT {', '.join('c.' + col for col in COLUMNS)}, bm25({FTS_TABLE}) AS rank "
+        f"FROM {FTS_TABLE} CROSS JOIN {TABLE_NAME} AS c ON c.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH ? AND c.username = ? "
+        f"ORDER BY rank LIMIT ? OFFSET ?"
+    )
+    SEARCH_COUNT_SQL = (
+        f"SELECT COUNT(*) FROM {FTS_TABLE} CROSS JOIN {TABLE_NAME} AS c ON c.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH ? AND c.username = ?"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.FTS_TABLE,)
+            ).fetchone()
+            if not has_fts:
+                # First run (or upgrade from a db without search): create and backfill the index
+                conn.executescript(self.FTS_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def insert(self, row):
+        with self._connect() as conn:
+            conn.execute(self.INSERT_SQL, tuple(row.get(col) for col in COLUMNS))
+
+    def fetch(self, username):
+        rows = self._connect().execute(self.SELECT_SQL, (username,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, username, date=None):
+        with self._connect() as conn:
+            if date is None:
+                conn.execute(self.DELETE_SQL, (username,))
+            else:
+                conn.execute(self.DELETE_DATE_SQL, (username, date))
+
+    def search(self, username, query, limit, offset=0):
+        """Ranked (bm25) full-text search, returns (rows, total matches)"""
+        terms = search_terms(query)
+        if not terms:
+            return [], 0
+        # Quote every term so user input can't inject FTS5 syntax; '*' allows prefix matches
+        match = " ".join(f'"{term}"*' for term in terms)
+        conn = self._connect()
+        total = conn.execute(self.SEARCH_COUNT_SQL, (match, username)).fetchone()[0]
+        rows = conn.execute(self.SEARCH_SQL, (match, username, limit, offset)).fetchall()
+        return [dict(row) for row in rows], total
+
+
+# -----------------------------
+# Backend selection
+# -----------------------------
+
+def create_history_store(backend, **options):
+    """Create the history store selected by HISTORY_BACKEND in config.py"""
+    if backend == "supabase":
+        return SupabaseHistoryStore(options["supabase_url"], options["supabase_key"])
+    if backend == "sqlite":
+        return SQLiteHistoryStore(options["sqlite_path"])
+    raise ValueError(f"Unknown history backend: {backend!r} (expected 'supabase' or 'sqlite')")
@@ -0,0 +1,193 @@
+"""
+Process-wide scheduler for Gemini calls.
+
+Every Streamlit session runs in its own thread of the same process, so one scheduler
+instance can see all of them:
+- Token buckets per API key (requests/minute and tokens/minute) keep bursts under quota.
+- One queue per user, served round-robin, so a user asking many questions can't starve others.
+- Identical requests already queued or running are coalesced into a single call (single-flight).
+
+The scheduler only needs a zero-argument callable per request, so it can be driven by
+a local fake endpoint (see loadtest.py) instead of the real API.
+"""
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class TokenBucket:
+    """Refills `rate_per_min` units per minute up to `capacity`"""
+
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if available now)"""
+        self._refill()
+        # Requests bigger than the bucket are let through once it is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class _Job:
+    def __init__(self, key, user, api_key, tokens, call):
+        self.key = key
+        self.user = user
+        self.api_key = api_key
+        self.tokens = tokens
+        self.call = call
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrent=4):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrent = max_concurrent
+        self.running = 0             # calls currently executing (jobs stay queued until a slot frees)
+        self.lock = threading.Condition()
+        self.queues = OrderedDict()  # user -> deque of jobs, in round-robin order
+        self.inflight = {}           # request key -> job (queued or running)
+        self.buckets = {}            # api key -> (request bucket, token bucket)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="llm")
+        self.stats = {"submitted": 0, "calls": 0, "coalesced": 0, "max_wait_s": 0.0}
+        threading.Thread(target=self._dispatch_loop, name="llm-scheduler", daemon=True).start()
+
+    # ---------------- Public API ----------------
+    def submit(self, api_key, user, key, tokens, call):
+        """
+        Queue `call` for `user`. Returns (future, coalesced).
+        Requests with the same `key` share one call and one result.
+        """
+        with self.lock:
+            self.stats["submitted"] += 1
+            job = self.inflight.get(key)
+            if job is not None:
+                self.stats["coalesced"] += 1
+                return job.future, True
+            job = _Job(key, user, api_key, tokens, call)
+            self.inflight[key] = job
+            self.queues.setdefault(user, deque()).append(job)
+            self.lock.notify()
+            return job.future, False
+
+    def position(self, future):
+        """1-based place in the round-robin dispatch order, 0 once the call has started"""
+        with self.lock:
+            order = itertools.chain.from_iterable(
+                itertools.zip_longest(*self.queues.values())
+            )
+            for place, job in enumerate((j for j in order if j is not None), start=1):
+                if job.future is future:
+                    return place
+            return 0
+
+    def run(self, api_key, user, key, tokens, call, on_wait=None, poll=0.5):
+        """Blocking helper: submit, report queue position through `on_wait(position)`, return the result"""
+        future, _ = self.submit(api_key, user, key, tokens, call)
+        while True:
+            try:
+                return future.result(timeout=poll)
+            except FutureTimeoutError:
+                if on_wait is not None:
+                    on_wait(self.position(future))
+
+    # ---------------- Dispatching ----------------
+    def _buckets_for(self, api_key):
+        if api_key not in self.buckets:
+            self.buckets[api_key] = (TokenBucket(self.requests_per_minute), TokenBucket(self.tokens_per_minute))
+        return self.buckets[api_key]
+
+    def _next_job(self):
+        """Pick the first user (in rotation) whose head job fits its key's quota.
+        Returns (job, None) or (None, seconds to wait; None = until notified)"""
+        if self.running >= self.max_concurrent:
+            # Wait for _execute to free a slot, so queue order and positions stay meaningful
+            return None, None
+        shortest_wait = None
+        for user in list(self.queues):
+            job = self.queues[user][0]
+            requests, tokens = self._buckets_for(job.api_key)
+            wait = max(requests.wait_time(1), tokens.wait_time(job.tokens))
+            if wait == 0:
+                requests.take(1)
+                tokens.take(job.tokens)
+                self.queues[user].popleft()
+                # Move the user to the back of the rotation
+                queue = self.queues.pop(user)
+                if queue:
+                    self.queues[user] = queue
+                return job, None
+            shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+        return None, shortest_wait
+
+    def _dispatch_loop(self):
+        while True:
+            with self.lock:
+                job, wait = self._next_job()
+                while job is None:
+                    self.lock.wait(timeout=wait)
+                    job, wait = self._next_job()
+                self.running += 1
+                self.stats["calls"] += 1
+                self.stats["max_wait_s"] = max(self.stats["max_wait_s"], time.monotonic() - job.enqueued)
+            self.executor.submit(self._execute, job)
+
+    def _execute(self, job):
+        try:
+            result = job.call()
+        except BaseException as e:
+            self._finish(job)
+            job.future.set_exception(e)
+        else:
+            self._finish(job)
+            job.future.set_result(result)
+
+    def _finish(self, job):
+        with self.lock:
+            self.inflight.pop(job.key, None)
+            self.running -= 1
+            self.lock.notify()
+
+
+def request_key(*parts):
+    """Stable key for coalescing identical requests (model, prompt parts, ...)"""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def estimate_tokens(text, max_output_tokens=1024):
+    """Rough token count for quota accounting (~4 characters per token) plus the answer budget"""
+    return len(text) // 4 + max_output_tokens
+
+
+# ---------------- Process-wide instance ----------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(requests_per_minute, tokens_per_minute, max_concurrent=4):
+    """Return the scheduler shared by every session in this process (created on first use)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(requests_per_minute, tokens_per_minute, max_concurrent)
+        return _scheduler
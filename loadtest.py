@@ -0,0 +1,320 @@
+"""
+Load test for AskMyPDF.
+
+Drives N simulated users through login -> chatbot page -> upload + Process PDFs -> questions,
+using Streamlit's testing API (AppTest) against home.py. Gemini and the history store are
+replaced by local fakes, so no API key, quota or Supabase project is needed. Gemini calls
+still go through the shared scheduler (llm_scheduler.py), with the quota set by --llm-rpm/--llm-tpm.
+
+Every concurrency level runs in a fresh worker process (one thread per session, like the
+Streamlit server) so memory numbers start from the same baseline.
+
+Usage:
+    python loadtest.py --levels 1 2 4 8 --questions 3
+    python loadtest.py --levels 1 4 --pdf my.pdf --fake-embeddings   # offline, no model download
+    python loadtest.py --levels 8 --llm-rpm 10                          # queueing under the free-tier quota
+    python loadtest.py --levels 8 --shared-questions                    # identical questions, coalesced calls
+    python loadtest.py --levels 4 8 --retrieval-url http://127.0.0.1:8765  # against retrieval_server.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME_SCRIPT = os.path.join(APP_DIR, "home.py")
+
+# Looks like a real key so validate_api_key() accepts it, never sent anywhere
+FAKE_API_KEY = "AIza" + "x" * 35
+
+
+# ---------------- Local fakes ----------------
+class FakeHistoryStore:
+    """In-memory stand-in for history_store backends (same insert/fetch/delete/search interface)"""
+
+    def __init__(self):
+        self.rows = []
+        self.lock = threading.Lock()
+
+    def insert(self, row):
+        with self.lock:
+            self.rows.append(dict(row))
+
+    def fetch(self, username):
+        with self.lock:
+            return [row for row in self.rows if row["username"] == username]
+
+    def delete(self, username, date=None):
+        with self.lock:
+            self.rows = [
+                row for row in self.rows
+                if row["username"] != username or (date is not None and row["date"] != date)
+            ]
+
+    def search(self, username, query, limit, offset=0):
+        terms = query.lower().split()
+        matches = [
+            row for row in self.fetch(username)
+            if all(term in f"{row['question']} {row['answer']} {row['pdfs']}".lower() for term in terms)
+        ]
+        return matches[offset:offset + limit], len(matches)
+
+
+def fake_gemini(latency):
+    """Returns a ChatGoogleGenerativeAI replacement that waits `latency` seconds per call"""
+    from langchain_core.runnables import RunnableLambda
+
+    def answer(prompt):
+        time.sleep(latency)
+        return f"Fake answer ({len(prompt.to_string())} prompt chars)"
+
+    def factory(**kwargs):
+        return RunnableLambda(answer)
+    return factory
+
+
+def make_sample_pdf(pages=20):
+    """Build a small text PDF (with a repeated header/footer) without any PDF library"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for n in range(pages):
+        lines = ["ACME Corp - Internal Report"]
+        lines += [f"Section {n}.{i}: revenue grew {n * 7 + i} percent in region {i} of {n}." for i in range(30)]
+        lines += [f"Page {n + 1} of {pages}"]
+        text = " ".join(f"({line}) Tj 0 -14 Td" for line in lines)
+        stream = f"BT /F1 10 Tf 50 800 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>"
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+# ---------------- Measurements ----------------
+def rss_mb():
+    """Resident memory of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+# ---------------- One simulated user ----------------
+def run_session(index, pdfs, questions, timeout, timings, errors, sessions):
+    from streamlit.testing.v1 import AppTest
+
+    def step(name, action):
+        start = time.perf_counter()
+        at = action()
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].message}")
+        return at
+
+    try:
+        at = AppTest.from_file(HOME_SCRIPT, default_timeout=timeout)
+        at.secrets = worker_secrets()
+        step("open", at.run)
+        at.text_input(key="username_input").input(f"loaduser{index}")
+        step("login", at.button(key="enter_btn").click().run)
+        step("open_chatbot", at.button(key="Chatbot").click().run)
+
+        uploader = at.sidebar.file_uploader[0]
+        uploader.set_value([(name, data, "application/pdf") for name, data in pdfs])
+        process = next(b for b in at.sidebar.button if b.label == "Process PDFs")
+        at = step("process_pdfs", process.click().run)
+        if at.sidebar.error:
+            raise RuntimeError(f"process_pdfs: {at.sidebar.error[0].value}")
+
+        for question in questions:
+            at = step("question", at.chat_input[0].set_value(question).run)
+            if at.error:
+                raise RuntimeError(f"question: {at.error[0].value}")
+        # Keep the session (and everything in its session_state) alive for the memory reading
+        sessions.append(at)
+    except Exception as e:
+        errors.append(f"session {index}: {e}")
+
+
+def worker_secrets():
+    return {
+        "GOOGLE_API_KEY": FAKE_API_KEY,
+        "HISTORY_BACKEND": "sqlite",
+        "SQLITE_DB_PATH": os.path.join(os.getcwd(), "loadtest_history.db"),
+        "RETRIEVAL_SERVICE_URL": os.environ.get("LOADTEST_RETRIEVAL_URL", "")
+    }
+
+
+def run_level(args):
+    """Worker process: run args.sessions concurrent users and print a JSON result"""
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, APP_DIR)
+    # Import the app modules once (inside a script run so st.secrets is populated), then swap in fakes
+    warmup = AppTest.from_string("import app", default_timeout=args.timeout)
+    warmup.secrets = worker_secrets()
+    warmup.run()
+    if warmup.exception:
+        raise SystemExit(f"Could not import app: {warmup.exception[0].message}")
+
+    import app
+    import history
+    import llm_scheduler
+    history.store = FakeHistoryStore()
+    app.ChatGoogleGenerativeAI = fake_gemini(args.llm_latency)
+    # Shared Gemini scheduler with the quota under test
+    llm_scheduler._scheduler = llm_scheduler.LLMScheduler(args.llm_rpm, args.llm_tpm, args.llm_concurrency)
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        app.HuggingFaceEmbeddings = lambda **kwargs: DeterministicFakeEmbedding(size=384)
+
+    if args.pdf:
+        pdfs = [(os.path.basename(path), open(path, "rb").read()) for path in args.pdf]
+    else:
+        pdfs = [("sample.pdf", make_sample_pdf())]
+    # Distinct questions per user by default; shared ones all coalesce into the same Gemini calls
+    questions = [
+        [f"What was the revenue growth in section {i}.{i}?" + ("" if args.shared_questions else f" (user {s})")
+         for i in range(args.questions)]
+        for s in range(args.sessions)
+    ]
+
+    baseline = rss_mb()
+    timings, errors, sessions = {}, [], []
+    threads = [
+        threading.Thread(target=run_session, args=(i, pdfs, questions[i], args.timeout, timings, errors, sessions))
+        for i in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    peak = rss_mb()
+
+    completed = len(timings.get("question", []))
+    result = {
+        "sessions": args.sessions,
+        "ok_sessions": len(sessions),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "questions_per_s": completed / elapsed if elapsed else 0.0,
+        "rss_baseline_mb": baseline,
+        "rss_mb": peak,
+        "mb_per_session": (peak - baseline) / max(len(sessions), 1),
+        "llm": dict(llm_scheduler._scheduler.stats),
+        "latency": {
+            name: {p: percentile(values, p) for p in (50, 95, 99)}
+            for name, values in timings.items()
+        }
+    }
+    print(json.dumps(result))
+
+
+# ---------------- Driver ----------------
+def print_report(results):
+    print(f"\n{'users':>5} {'ok':>4} {'q/s':>7} {'MB/user':>8} {'RSS MB':>8}  "
+          f"{'process p50/p95/p99 (s)':>26}  {'question p50/p95/p99 (s)':>26}")
+    for r in results:
+        lat = r["latency"]
+        proc = lat.get("process_pdfs", {})
+        ques = lat.get("question", {})
+        fmt = lambda d: "/".join(f"{d.get(p, 0.0):.2f}" for p in ("50", "95", "99"))
+        print(f"{r['sessions']:>5} {r['ok_sessions']:>4} {r['questions_per_s']:>7.2f} "
+              f"{r['mb_per_session']:>8.1f} {r['rss_mb']:>8.0f}  {fmt(proc):>26}  {fmt(ques):>26}")
+        llm = r["llm"]
+        print(f"      LLM: {llm['calls']} calls for {llm['submitted']} questions "
+              f"({llm['coalesced']} coalesced), longest queue wait {llm['max_wait_s']:.2f}s")
+        for error in r["errors"][:3]:
+            print(f"      ⚠️ {error}")
+
+    best = max(results, key=lambda r: r["questions_per_s"])
+    print(f"\nThroughput peaks at {best['sessions']} concurrent users "
+          f"({best['questions_per_s']:.2f} questions/s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session load test for AskMyPDF")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8], help="Concurrent users per run")
+    parser.add_argument("--questions", type=int, default=3, help="Questions asked by each user")
+    parser.add_argument("--shared-questions", action="store_true",
+                        help="All users ask the same questions (measures request coalescing)")
+    parser.add_argument("--pdf", nargs="*", help="PDFs to upload (default: a generated 20 page report)")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds the fake Gemini waits per answer")
+    parser.add_argument("--llm-rpm", type=float, default=6000, help="Scheduler requests/minute per API key")
+    parser.add_argument("--llm-tpm", type=float, default=10_000_000, help="Scheduler tokens/minute per API key")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Max Gemini calls running at once")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use a hashing embedder instead of MiniLM")
+    parser.add_argument("--retrieval-url", default="", help="Use a running retrieval_server.py instead of in-app FAISS")
+    parser.add_argument("--timeout", type=float, default=600, help="Per script run timeout in seconds")
+    parser.add_argument("--json", help="Also write raw results to this file")
+    parser.add_argument("--sessions", type=int, help=argparse.SUPPRESS)  # worker mode
+    args = parser.parse_args()
+
+    if args.sessions:
+        run_level(args)
+        return
+
+    results = []
+    for level in args.levels:
+        cmd = [sys.executable, os.path.abspath(__file__), "--sessions", str(level),
+               "--questions", str(args.questions), "--llm-latency", str(args.llm_latency),
+               "--llm-rpm", str(args.llm_rpm), "--llm-tpm", str(args.llm_tpm),
+               "--llm-concurrency", str(args.llm_concurrency),
+               "--timeout", str(args.timeout)]
+        if args.pdf:
+            cmd += ["--pdf", *[os.path.abspath(path) for path in args.pdf]]
+        if args.fake_embeddings:
+            cmd.append("--fake-embeddings")
+        if args.shared_questions:
+            cmd.append("--shared-questions")
+        print(f"▶️ Running {level} concurrent users...")
+        # Fresh working dir per level, so each run starts with an empty loadtest_history.db
+        env = dict(os.environ, LOADTEST_RETRIEVAL_URL=args.retrieval_url)
+        with tempfile.TemporaryDirectory() as workdir:
+            proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:])
+            raise SystemExit(f"Worker for {level} users failed")
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
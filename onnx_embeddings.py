@@ -0,0 +1,225 @@
+"""
+int8-quantized ONNX Runtime backend for the all-MiniLM-L6-v2 embedder.
+
+Drop-in replacement for HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2") that runs on
+CPU from local files only (no PyTorch at runtime). Select it with EMBEDDING_BACKEND = "onnx"
+in config.py.
+
+One-time export (needs torch + transformers and the model from the Hugging Face Hub or its cache):
+    python onnx_embeddings.py export --out models/all-MiniLM-L6-v2-onnx
+
+Compare against the PyTorch backend (retrieval agreement + speed):
+    python onnx_embeddings.py check --model-dir models/all-MiniLM-L6-v2-onnx --pdf some.pdf
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+# all-MiniLM-L6-v2 was trained with 256 word pieces at most
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """
+    Mean-pooled, L2-normalised MiniLM sentence embeddings from a quantized ONNX model.
+    Texts are sorted by token length and batched with similar lengths, so little
+    compute is spent on padding.
+    """
+
+    def __init__(self, model_dir, intra_op_threads=0, batch_size=32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        # 0 lets ONNX Runtime pick (one thread per physical core)
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.batch_size = batch_size
+
+    def _embed_batch(self, encodings):
+        length = max(len(e.ids) for e in encodings)
+        input_ids = np.full((len(encodings), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        # Mean pooling over real tokens, then L2 normalisation (as in sentence-transformers)
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(list(texts))
+        # Length-bucketed batching: neighbours in this order have similar lengths
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embedded = self._embed_batch([encodings[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), embedded.shape[1]), dtype=np.float32)
+            vectors[batch] = embedded
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# ---------------- Export ----------------
+def export(out_dir, model_name=MODEL_NAME):
+    """Export MiniLM to ONNX, quantize the weights to int8 and save the tokenizer next to it"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    class TokenEmbeddings(torch.nn.Module):
+        # Fixed positional signature for the tracer (transformers' forward takes many kwargs)
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = TokenEmbeddings(AutoModel.from_pretrained(model_name)).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {0: "batch", 1: "sequence"}
+    fp32_path = os.path.join(out_dir, "model_fp32.onnx")
+    torch.onnx.export(
+        model,
+        tuple(sample[name] for name in names),
+        fp32_path,
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={name: dynamic for name in names + ["last_hidden_state"]},
+        opset_version=17,
+        dynamo=False
+    )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, TOKENIZER_FILE))
+    print(f"✅ Saved {MODEL_FILE} and {TOKENIZER_FILE} to {out_dir}")
+
+
+# ---------------- Check against PyTorch ----------------
+def load_chunks(pdf_paths):
+    from PyPDF2 import PdfReader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    text = ""
+    for path in pdf_paths:
+        for page in PdfReader(path).pages:
+            text += (page.extract_text() or "") + "\n"
+    # Default splitter settings of app.get_text_chunks (no tuned config)
+    return RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200).split_text(text)
+
+
+def timed_embed(embeddings, chunks):
+    embeddings.embed_documents(chunks[:8])  # warm-up
+    start = time.perf_counter()
+    vectors = np.array(embeddings.embed_documents(chunks), dtype=np.float32)
+    return vectors, len(chunks) / (time.perf_counter() - start)
+
+
+def unit(vectors):
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def check(model_dir, chunks, queries, k=4, threads=0, min_cosine=0.98, min_overlap=0.9,
+          reference_model="all-MiniLM-L6-v2"):
+    """Compare the ONNX backend with HuggingFaceEmbeddings on the same chunks and queries"""
+    import faiss
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    reference = HuggingFaceEmbeddings(model_name=reference_model)
+    onnx = OnnxMiniLMEmbeddings(model_dir, intra_op_threads=threads)
+
+    ref_vectors, ref_speed = timed_embed(reference, chunks)
+    onnx_vectors, onnx_speed = timed_embed(onnx, chunks)
+    ref_vectors = unit(ref_vectors)
+    cosine = (ref_vectors * onnx_vectors).sum(axis=1)
+
+    # Same index type FAISS.from_texts builds (flat L2) for both backends
+    k = min(k, len(chunks))
+    results = []
+    for vectors, embeddings in ((ref_vectors, reference), (onnx_vectors, onnx)):
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        query_vectors = unit(np.array(embeddings.embed_documents(queries), dtype=np.float32))
+        results.append(index.search(query_vectors, k)[1])
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(*results)])
+    top1 = np.mean([a[0] == b[0] for a, b in zip(*results)])
+
+    print(f"Chunks: {len(chunks)} | Queries: {len(queries)} | k={k}")
+    print(f"Embedding cosine (ONNX vs PyTorch): mean {cosine.mean():.4f}, min {cosine.min():.4f}")
+    print(f"Retrieval agreement: top-{k} overlap {overlap:.3f}, top-1 match {top1:.3f}")
+    print(f"PyTorch: {ref_speed:.1f} chunks/s | ONNX int8: {onnx_speed:.1f} chunks/s | "
+          f"speedup x{onnx_speed / ref_speed:.2f}")
+    passed = cosine.min() >= min_cosine and overlap >= min_overlap
+    print("✅ Within tolerance" if passed else "❌ Outside tolerance")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime backend for the MiniLM embedder")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="Export and quantize all-MiniLM-L6-v2")
+    export_cmd.add_argument("--out", required=True, help="Directory for the ONNX model and tokenizer")
+    export_cmd.add_argument("--model", default=MODEL_NAME, help="Hugging Face model name or local path")
+
+    check_cmd = sub.add_parser("check", help="Compare retrieval and speed with the PyTorch backend")
+    check_cmd.add_argument("--model-dir", required=True)
+    check_cmd.add_argument("--pdf", nargs="+", required=True, help="PDFs to chunk and embed")
+    check_cmd.add_argument("--queries", nargs="*", help="Questions to retrieve for (default: chunk openings)")
+    check_cmd.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = auto)")
+    check_cmd.add_argument("--reference-model", default="all-MiniLM-L6-v2", help="PyTorch model name or local path")
+    check_cmd.add_argument("--min-cosine", type=float, default=0.98)
+    check_cmd.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.out, args.model)
+        return
+
+    chunks = load_chunks(args.pdf)
+    if not chunks:
+        raise SystemExit("No text found in the PDFs")
+    # Without explicit questions, use the first words of some chunks as queries
+    queries = args.queries or [" ".join(c.split()[:12]) for c in chunks[::max(1, len(chunks) // 20)]]
+    passed = check(args.model_dir, chunks, queries, threads=args.threads, min_cosine=args.min_cosine,
+                   min_overlap=args.min_overlap, reference_model=args.reference_model)
+    raise SystemExit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
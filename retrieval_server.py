@@ -0,0 +1,301 @@
+"""
+Local retrieval service shared by several Streamlit app processes.
+
+Without it every app process loads its own embedding model and every FAISS index it
+touches. With RETRIEVAL_SERVICE_URL set in config.py, app processes send chunks and
+questions here instead:
+- one embedding model for all workers
+- concurrent question embeddings are batched into one model call
+- indexes are cached by content hash (LRU in memory, saved to disk), so the same PDFs
+  uploaded from several workers or users are embedded and held once
+
+Run:
+    python retrieval_server.py --port 8765                       # PyTorch MiniLM
+    python retrieval_server.py --port 8765 --backend onnx --onnx-model-dir models/all-MiniLM-L6-v2-onnx
+
+Endpoints (JSON over HTTP):
+    POST /index   {"chunks": [...], "metadatas": [...]}      -> {"index_id": "..."}
+    POST /search  {"index_id": "...", "query": "...", "k": 4} -> {"documents": [{"page_content", "metadata"}]}
+    GET  /health                                             -> cache and batching stats
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.documents import Document
+
+
+def index_id_for(chunks, metadatas=None):
+    """Content hash used as the shared cache key for an index"""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode())
+        digest.update(b"\x00")
+    digest.update(json.dumps(metadatas, sort_keys=True).encode())
+    return digest.hexdigest()[:32]
+
+
+# What index_id_for() returns, anything else is rejected before touching the disk
+INDEX_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+# ---------------- Server side ----------------
+class QueryBatcher:
+    """Collects query texts from concurrent requests and embeds them in one batch"""
+
+    def __init__(self, embeddings, max_batch=32, max_wait=0.005):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = queue.Queue()
+        self.stats = {"queries": 0, "batches": 0}
+        threading.Thread(target=self._loop, name="query-batcher", daemon=True).start()
+
+    def embed(self, text):
+        future = Future()
+        self.pending.put((text, future))
+        return future.result()
+
+    def _loop(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["queries"] += len(batch)
+            self.stats["batches"] += 1
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+class IndexCache:
+    """FAISS indexes by id: LRU in memory, every index also saved under `index_dir`"""
+
+    def __init__(self, embeddings, index_dir, max_indexes=32):
+        self.embeddings = embeddings
+        self.index_dir = os.path.realpath(index_dir)
+        self.max_indexes = max_indexes
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+        # One lock per index being loaded or built, removed once it is in memory
+        self.id_locks = {}
+        self.stats = {"hits": 0, "disk_loads": 0, "builds": 0}
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _path(self, index_id):
+        """Directory of an index, rejecting ids that are not index_id_for() hashes"""
+        if not isinstance(index_id, str) or not INDEX_ID_PATTERN.fullmatch(index_id):
+            raise ValueError("invalid index_id")
+        path = os.path.realpath(os.path.join(self.index_dir, index_id))
+        if os.path.dirname(path) != self.index_dir:
+            raise ValueError("invalid index_id")
+        return path
+
+    def _cached(self, index_id):
+        with self.lock:
+            if index_id in self.indexes:
+                self.indexes.move_to_end(index_id)
+                self.stats["hits"] += 1
+                return self.indexes[index_id]
+        return None
+
+    def _remember(self, index_id, index, stat):
+        with self.lock:
+            self.stats[stat] += 1
+            self.indexes[index_id] = index
+            self.indexes.move_to_end(index_id)
+            while len(self.indexes) > self.max_indexes:
+                self.indexes.popitem(last=False)
+
+    def _load(self, index_id, path):
+        """Memory or disk lookup, caller holds the index's id lock"""
+        from langchain_community.vectorstores import FAISS
+
+        index = self._cached(index_id)
+        if index is not None or not os.path.isdir(path):
+            return index
+        # Files written by this server only (path checked by _path)
+        index = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        self._remember(index_id, index, "disk_loads")
+        return index
+
+    def _locked(self, index_id, action):
+        """Run action() holding the id lock, so each index is loaded or built by one request at a time"""
+        with self.lock:
+            id_lock = self.id_locks.setdefault(index_id, threading.Lock())
+        with id_lock:
+            try:
+                return action()
+            finally:
+                # Requests already waiting on id_lock find the index in memory
+                with self.lock:
+                    if self.id_locks.get(index_id) is id_lock:
+                        del self.id_locks[index_id]
+
+    def get(self, index_id):
+        """Return the index or None if it was never built"""
+        path = self._path(index_id)
+        index = self._cached(index_id)
+        if index is not None:
+            return index
+        return self._locked(index_id, lambda: self._load(index_id, path))
+
+    def build(self, chunks, metadatas):
+        from langchain_community.vectorstores import FAISS
+
+        index_id = index_id_for(chunks, metadatas)
+        path = self._path(index_id)
+
+        def load_or_build():
+            # Same documents arriving from several workers at once are embedded only once
+            if self._load(index_id, path) is None:
+                index = FAISS.from_texts(chunks, embedding=self.embeddings, metadatas=metadatas)
+                index.save_local(path)
+                self._remember(index_id, index, "builds")
+
+        self._locked(index_id, load_or_build)
+        return index_id
+
+
+def make_handler(cache, batcher):
+    class RetrievalHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, {
+                "indexes_in_memory": len(cache.indexes),
+                "cache": cache.stats,
+                "batching": batcher.stats
+            })
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path == "/index":
+                    index_id = cache.build(request["chunks"], request.get("metadatas"))
+                    return self._reply(200, {"index_id": index_id})
+                if self.path == "/search":
+                    try:
+                        index = cache.get(request.get("index_id"))
+                    except ValueError as e:
+                        return self._reply(400, {"error": str(e)})
+                    if index is None:
+                        return self._reply(404, {"error": "unknown index_id"})
+                    vector = batcher.embed(request["query"])
+                    docs = index.similarity_search_by_vector(vector, k=request.get("k", 4))
+                    return self._reply(200, {"documents": [
+                        {"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs
+                    ]})
+                self._reply(404, {"error": "not found"})
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet, one line per request is too much under load
+
+    return RetrievalHandler
+
+
+def make_server(embeddings, host="127.0.0.1", port=8765, index_dir="retrieval_indexes", max_indexes=32,
+                max_batch=32, max_wait=0.005):
+    cache = IndexCache(embeddings, index_dir, max_indexes)
+    batcher = QueryBatcher(embeddings, max_batch, max_wait)
+    server = ThreadingHTTPServer((host, port), make_handler(cache, batcher))
+    server.daemon_threads = True
+    return server
+
+
+# ---------------- Client side (used by app.py) ----------------
+class RetrievalClient:
+    def __init__(self, url, timeout=300):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Retrieval service error: {json.loads(e.read()).get('error', e.reason)}")
+
+    def build_index(self, chunks, metadatas=None):
+        index_id = self._post("/index", {"chunks": chunks, "metadatas": metadatas})["index_id"]
+        return RemoteIndex(self, index_id)
+
+    def search(self, index_id, query, k=4):
+        documents = self._post("/search", {"index_id": index_id, "query": query, "k": k})["documents"]
+        return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in documents]
+
+
+class RemoteIndex:
+    """Handle to an index held by the retrieval service (same similarity_search as FAISS)"""
+
+    def __init__(self, client, index_id):
+        self.client = client
+        self.index_id = index_id
+
+    def similarity_search(self, query, k=4):
+        return self.client.search(self.index_id, query, k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding + FAISS retrieval service for AskMyPDF")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--index-dir", default="retrieval_indexes", help="Where indexes are saved")
+    parser.add_argument("--max-indexes", type=int, default=32, help="Indexes kept in memory (LRU)")
+    parser.add_argument("--max-batch", type=int, default=32, help="Most questions embedded per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="How long to wait to fill a batch")
+    parser.add_argument("--backend", choices=["pytorch", "onnx"], default="pytorch")
+    parser.add_argument("--onnx-model-dir", default="models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = auto)")
+    args = parser.parse_args()
+
+    if args.backend == "onnx":
+        from onnx_embeddings import OnnxMiniLMEmbeddings
+        embeddings = OnnxMiniLMEmbeddings(args.onnx_model_dir, intra_op_threads=args.threads)
+    else:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+
+    server = make_server(embeddings, args.host, args.port, args.index_dir, args.max_indexes,
+                         args.max_batch, args.max_wait_ms / 1000)
+    print(f"🔎 Retrieval service listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+-- Full-text search for the chat history page (Supabase / Postgres backend).
+-- Run once in the Supabase SQL editor. Adds an indexed tsvector column over
+-- question, answer and pdfs plus a ranked, paginated search function and a
+-- match count function that history_store.SupabaseHistoryStore.search calls through RPC.
+
+ALTER TABLE chat_history
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(pdfs, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(answer, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_search_vector
+    ON chat_history USING GIN (search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_username_date
+    ON chat_history (username, date);
+
+-- Earlier versions returned a total_count column (changes the return type)
+DROP FUNCTION IF EXISTS search_chat_history(text, text, integer, integer);
+
+CREATE OR REPLACE FUNCTION search_chat_history(
+    p_username text,
+    p_query text,
+    p_limit integer,
+    p_offset integer
+)
+RETURNS TABLE (
+    username text,
+    question text,
+    answer text,
+    model text,
+    "timestamp" text,
+    pdfs text,
+    date text,
+    rank real
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        c.username, c.question, c.answer, c.model, c."timestamp"::text, c.pdfs, c.date::text,
+        ts_rank(c.search_vector, q) AS rank
+    FROM chat_history AS c, to_tsquery('english', p_query) AS q
+    WHERE c.username = p_username AND c.search_vector @@ q
+    ORDER BY rank DESC
+    LIMIT p_limit OFFSET p_offset;
+$$;
+
+-- Total matches, counted separately so it is known even for a page past the end
+CREATE OR REPLACE FUNCTION search_chat_history_count(
+    p_username text,
+    p_query text
+)
+RETURNS bigint
+LANGUAGE sql STABLE
+AS $$
+    SELECT count(*)
+    FROM chat_history AS c, to_tsquery('english', p_query) AS q
+    WHERE c.username = p_username AND c.search_vector @@ q;
+$$;